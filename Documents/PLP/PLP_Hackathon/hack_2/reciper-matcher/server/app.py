@@ -1,28 +1,78 @@
-import os, json, datetime as dt
-from flask import Flask, request, jsonify, send_from_directory, g, session
-from flask_cors import CORS
+import os, hashlib, logging, secrets, functools, datetime as dt
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+import anyio
+import ijson
+import pybreaker
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type
+from fastapi import FastAPI, Request, Response, Depends, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+import orjson
+from fastapi.staticfiles import StaticFiles
+from starlette.middleware.sessions import SessionMiddleware
+from pydantic import BaseModel, field_validator
 from dotenv import load_dotenv
+from suggestions import (
+    SUGGEST_TTL, SUGGEST_MAX_TOKENS, SUGGEST_TEMPERATURE, _RECIPE_SPEC, _suggest_key, _suggest_body,
+    demo_recipes, _normalize_recipe, _normalize_recipes, _full_set, run_openai_suggest,
+)
 
 # ---------- Paths / Env ----------
 BASE_DIR   = os.path.abspath(os.path.dirname(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 load_dotenv(os.path.join(BASE_DIR, ".env"))  # loads DATABASE_URL, SECRET_KEY, OPENAI_API_KEY, PORT
 
-# ---------- Flask App ----------
-app = Flask(__name__, static_folder=STATIC_DIR, static_url_path="/")
-app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-change-me")
-CORS(app)
+# ---------- FastAPI App ----------
+class ORJSONResponse(JSONResponse):
+    """JSON responses encoded with orjson (several times faster than stdlib json)."""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+@asynccontextmanager
+async def lifespan(app):
+    # sync DB routes share this threadpool; it caps concurrent DB-bound requests per worker
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    yield
+    if client:
+        await client.close()   # drains the shared httpx pool
+
+# Not the default_response_class: routes with a response_model are serialised
+# straight to JSON bytes by pydantic-core, which a custom class would bypass.
+# Routes returning plain dicts opt in with response_class=ORJSONResponse.
+app = FastAPI(lifespan=lifespan)
+logger = logging.getLogger("recipe-matcher")
+app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "dev-change-me"))
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 # ---------- DB (SQLAlchemy) ----------
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, text
+    create_engine, Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index, text, select, delete, bindparam, func
 )
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship, scoped_session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship, Session
+from sqlalchemy.exc import IntegrityError, OperationalError
 
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'app.db')}")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True)
-SessionLocal = scoped_session(sessionmaker(bind=engine, autoflush=False, autocommit=False))
+# No pool_pre_ping: it costs a SELECT 1 round-trip on every checkout. Connections are
+# recycled well inside MySQL's wait_timeout instead, and the rare connection that
+# died anyway (DB restart) is retried once by _retry_stale.
+# Connections are budgeted per host: DB_MAX_CONNECTIONS (kept under MySQL's default
+# max_connections of 151) is split across the WEB_CONCURRENCY gunicorn workers,
+# 2/3 pooled and 1/3 overflow -- 20 + 10 each with the defaults. The threadpool
+# defaults to the same per-worker total, so a thread never waits out the pool
+# timeout for a connection it can't get.
+_conns = max(int(os.getenv("DB_MAX_CONNECTIONS", "120")) // int(os.getenv("WEB_CONCURRENCY", "4")), 3)
+DB_POOL_SIZE    = int(os.getenv("DB_POOL_SIZE", str(_conns * 2 // 3)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(max(_conns - DB_POOL_SIZE, 0))))
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+_pool = {} if DATABASE_URL.startswith("sqlite") else {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_recycle": 1800,
+}
+engine = create_engine(DATABASE_URL, pool_pre_ping=False, future=True, **_pool)
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
 # ---------- Models ----------
@@ -42,7 +92,7 @@ class Recipe(Base):
     serves = Column(Integer, default=2)
     level = Column(String(16), default="Easy")
     img = Column(String(512), default="")
-    signature = Column(String(191), unique=True, index=True)   # 191 works on MySQL 5.7+
+    signature = Column(String(32), unique=True, index=True)    # blake2b-128 hex of title|desc|img
     created_at = Column(DateTime, default=dt.datetime.utcnow)
     saves = relationship("SavedRecipe", back_populates="recipe")
 
@@ -54,7 +104,11 @@ class SavedRecipe(Base):
     created_at = Column(DateTime, default=dt.datetime.utcnow)
     device = relationship("Device", back_populates="saves")
     recipe = relationship("Recipe", back_populates="saves")
-    __table_args__ = (UniqueConstraint("device_id_fk", "recipe_id_fk", name="uix_device_recipe"),)
+    __table_args__ = (
+        UniqueConstraint("device_id_fk", "recipe_id_fk", name="uix_device_recipe"),
+        # serves /api/history's WHERE device_id_fk=? ORDER BY created_at DESC LIMIT 50 as a range scan
+        Index("ix_saved_device_created", "device_id_fk", "created_at"),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -65,249 +119,798 @@ class User(Base):
     created_at = Column(DateTime, default=dt.datetime.utcnow)
 
 Base.metadata.create_all(engine)
+# create_all skips tables that already exist, so add indexes introduced later explicitly.
+# Every gunicorn worker runs this at import; the loser of the check-then-create race
+# gets "duplicate index" and must not fail its boot over it.
+for ix in SavedRecipe.__table__.indexes:
+    try:
+        ix.create(engine, checkfirst=True)
+    except Exception:
+        logger.warning("creating index %s failed (another worker may have made it)", ix.name, exc_info=True)
 
-# ---------- Request-scoped Session ----------
-@app.before_request
-def _create_session():
-    g.db = SessionLocal()
+def _signature_of(r: dict) -> str:
+    title = (r.get("title") or "").strip().lower()
+    desc  = (r.get("desc") or "").strip().lower()
+    img   = (r.get("img") or "").strip().lower()
+    return hashlib.blake2b(f"{title}|{desc}|{img}".encode(), digest_size=16).hexdigest()
+
+def _backfill_signatures():
+    """Re-sign recipes still carrying the old raw-string signature.
+
+    Rows whose new digest matches an existing recipe are merged into it: their
+    saved links move over (dropping ones the device already has) and the
+    duplicate recipe row is deleted. Old signatures were the raw title|desc|img
+    string cut to 191 chars, so any one of them either isn't 32 chars long or
+    contains "|", which a hex digest never does. The check is a scan of recipes
+    at every worker start; only the first run finds rows to rewrite.
+    """
+    stale = select(Recipe.id, Recipe.title, Recipe.desc, Recipe.img).where(
+        Recipe.signature.is_(None) | (func.length(Recipe.signature) != 32)
+        | Recipe.signature.contains("|", autoescape=True))
+    with engine.begin() as conn:
+        for rid, title, desc, img in conn.execute(stale).all():
+            sig = _signature_of({"title": title, "desc": desc, "img": img})
+            keep = conn.execute(select(Recipe.id).where(Recipe.signature == sig)).scalar_one_or_none()
+            if keep is None:
+                conn.execute(Recipe.__table__.update().where(Recipe.id == rid).values(signature=sig))
+                continue
+            has_keep = select(SavedRecipe.device_id_fk).where(SavedRecipe.recipe_id_fk == keep)
+            conn.execute(delete(SavedRecipe).where(
+                SavedRecipe.recipe_id_fk == rid, SavedRecipe.device_id_fk.in_(has_keep)))
+            conn.execute(SavedRecipe.__table__.update().where(SavedRecipe.recipe_id_fk == rid)
+                         .values(recipe_id_fk=keep))
+            conn.execute(delete(Recipe).where(Recipe.id == rid))
+
+try:
+    _backfill_signatures()
+except Exception:
+    # most likely another worker racing through the same backfill; whichever commits wins
+    logger.warning("recipe signature backfill failed", exc_info=True)
+
+# ---------- Hot-path statements ----------
+# Built once with bind params so SQLAlchemy's compiled-statement cache serves
+# every request instead of regenerating the SQL string per call.
+DEVICE_PK     = select(Device.id).where(Device.device_id == bindparam("did"))
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+RECIPE_BY_SIG = select(Recipe.id).where(Recipe.signature == bindparam("sig"))
+SAVED_LINK    = select(SavedRecipe.id).where(
+    SavedRecipe.device_id_fk == bindparam("dev"), SavedRecipe.recipe_id_fk == bindparam("rec"))
+HISTORY       = (
+    select(Recipe.id, Recipe.title, Recipe.desc, Recipe.time, Recipe.serves, Recipe.level, Recipe.img)
+      .join(SavedRecipe, SavedRecipe.recipe_id_fk == Recipe.id)
+      .where(SavedRecipe.device_id_fk == bindparam("dev"))
+      .order_by(SavedRecipe.created_at.desc())
+      .limit(50)
+)
+CLEAR_SAVED   = delete(SavedRecipe).where(SavedRecipe.device_id_fk == bindparam("dev"))
+
+# ---------- Upserts ----------
+# Get-or-create in a single statement per table instead of SELECT then INSERT,
+# which also closes the race between concurrent saves of the same recipe.
+if engine.dialect.name == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert as _upsert
+elif engine.dialect.name == "sqlite":
+    from sqlalchemy.dialects.sqlite import insert as _upsert
+elif engine.dialect.name in ("mysql", "mariadb"):
+    from sqlalchemy.dialects.mysql import insert as _upsert
+else:
+    _upsert = None   # SELECT-then-INSERT fallback below
+
+def _upsert_recipe(db: Session, r: dict, sig: str) -> int:
+    if _upsert is None:
+        rec_id = db.execute(RECIPE_BY_SIG, {"sig": sig}).scalar_one_or_none()
+        if rec_id is None:
+            rec = Recipe(**r, signature=sig)
+            db.add(rec); db.flush()
+            rec_id = rec.id
+        return rec_id
+    stmt = _upsert(Recipe).values(**r, signature=sig)
+    if engine.dialect.name in ("mysql", "mariadb"):
+        # LAST_INSERT_ID(id) on the duplicate branch makes lastrowid the existing row's id
+        return db.execute(stmt.on_duplicate_key_update(id=func.last_insert_id(Recipe.id))).lastrowid
+    stmt = stmt.on_conflict_do_update(index_elements=["signature"], set_={"signature": stmt.excluded.signature})
+    return db.execute(stmt.returning(Recipe.id)).scalar_one()
+
+def _link_saved(db: Session, dev: int, rec_id: int) -> bool:
+    """Insert the device/recipe link; False if it already existed."""
+    if _upsert is None:
+        if db.execute(SAVED_LINK, {"dev": dev, "rec": rec_id}).scalar_one_or_none():
+            return False
+        db.add(SavedRecipe(device_id_fk=dev, recipe_id_fk=rec_id)); db.flush()
+        return True
+    stmt = _upsert(SavedRecipe).values(device_id_fk=dev, recipe_id_fk=rec_id)
+    if engine.dialect.name in ("mysql", "mariadb"):
+        # id = id keeps real FK errors visible (INSERT IGNORE swallowed them). SQLAlchemy
+        # always sets FOUND_ROWS, so a no-op duplicate reports rowcount 1 like an insert;
+        # LAST_INSERT_ID(0) on that branch makes lastrowid 0 instead of the new id.
+        stmt = stmt.on_duplicate_key_update(id=SavedRecipe.id + func.last_insert_id(0))
+        return db.execute(stmt).lastrowid != 0
+    stmt = stmt.on_conflict_do_nothing(index_elements=["device_id_fk", "recipe_id_fk"])
+    return db.execute(stmt.returning(SavedRecipe.id)).scalar_one_or_none() is not None
 
-@app.teardown_appcontext
-def _remove_session(exc):
-    SessionLocal.remove()
+# ---------- Request-scoped Session ----------
+# DB routes are plain `def` so FastAPI runs them in its threadpool and the
+# blocking driver never stalls the event loop; only the OpenAI-facing suggest routes are async.
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _retry_stale(fn):
+    """Re-run a DB route once if its connection turned out to be dead. SQLAlchemy
+    has already invalidated the pool by then, so the retry gets a fresh one."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except OperationalError as e:
+            if not e.connection_invalidated: raise
+            logger.warning("stale DB connection in %s; retrying once", fn.__name__)
+            kwargs["db"].rollback()
+            return fn(*args, **kwargs)
+    return wrapper
+
+# ---------- Request / Response bodies ----------
+def _only_strings(items: list) -> list:
+    return [s for s in items if isinstance(s, str)]
+
+class SuggestIn(BaseModel):
+    ingredients: list[Any] = []
+
+    @field_validator("ingredients")
+    @classmethod
+    def _drop_non_strings(cls, v):   # null / numbers are skipped, not a 400
+        return _only_strings(v)
+
+class IngredientListsIn(BaseModel):
+    ingredient_lists: list[list[Any]] = []
+
+    @field_validator("ingredient_lists")
+    @classmethod
+    def _drop_non_strings(cls, v):
+        return [_only_strings(l) for l in v]
+
+class RecipeIn(BaseModel):
+    title: Optional[str] = None
+    desc: Optional[str] = None
+    time: Optional[float] = None     # float so 22.5 is truncated by save() like before, not a 400
+    serves: Optional[float] = None
+    level: Optional[str] = None
+    img: Optional[str] = None
+
+class RecipeOut(BaseModel):
+    title: str
+    desc: str
+    time: int
+    serves: int
+    level: str
+    img: str
+
+class SavedRecipeOut(RecipeOut):
+    id: int
+
+class SuggestOut(BaseModel):
+    recipes: list[RecipeOut]
+
+class HistoryOut(BaseModel):
+    recipes: list[SavedRecipeOut]
+
+class SaveIn(BaseModel):
+    device_id: Optional[str] = None
+    recipe: Optional[RecipeIn] = None
+
+class ClearIn(BaseModel):
+    device_id: Optional[str] = None
+
+class SignupIn(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    password: Optional[str] = None
+
+class LoginIn(BaseModel):
+    email: Optional[str] = None
+    password: Optional[str] = None
+
+@app.exception_handler(RequestValidationError)
+async def _invalid_body(request: Request, exc: RequestValidationError):
+    body = {"ok": False, "error": "invalid_json"} if request.url.path.startswith("/auth") else {"error": "invalid_json"}
+    return ORJSONResponse(body, status_code=400)
 
 # ---------- OpenAI (optional) ----------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = None
+client = _chat = None
+_TRANSIENT = ()   # OpenAI errors worth retrying
+_API_ERROR = ()   # any OpenAI API error
 if OPENAI_API_KEY:
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        import httpx
+        from openai import AsyncOpenAI, APIError, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+        _API_ERROR = APIError
+        _TRANSIENT = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+        # one long-lived HTTP/2 pool per worker keeps TLS connections to the API warm
+        client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        ))
+        # files/batches keep the SDK's retries (idempotency keys included);
+        # completions skip them because _complete owns retries and the breaker
+        _chat = client.with_options(max_retries=0).chat.completions
+    except Exception:
+        client = _chat = None
+
+# Transient failures (429, 5xx, timeouts) are retried with jittered backoff.
+# The breaker wraps the whole retried call, so a request that exhausts its
+# retries counts once; after 5 such requests in a row it opens for 30s and
+# callers go straight to demo recipes instead of piling onto a sick API.
+# Non-transient errors (bad request, auth) don't count towards opening it.
+openai_breaker = pybreaker.CircuitBreaker(
+    fail_max=5, reset_timeout=30, exclude=[lambda e: not isinstance(e, _TRANSIENT)],
+)
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=1, max=8),
+       retry=retry_if_exception_type(_TRANSIENT), reraise=True)
+async def _create_with_retry(**body):
+    return await _chat.create(**body)
+
+async def _complete(**body):
+    with openai_breaker.calling():
+        return await _create_with_retry(**body)
+
+# ---------- Redis cache (optional) ----------
+REDIS_URL = os.getenv("REDIS_URL")
+rcache = rcache_sync = None   # async client for async routes, sync one for threadpool routes
+if REDIS_URL:
+    try:
+        import redis, redis.asyncio as aioredis
+        rcache = aioredis.Redis.from_url(REDIS_URL)
+        rcache_sync = redis.Redis.from_url(REDIS_URL)
+    except Exception:
+        rcache = rcache_sync = None
+
+# ---------- Job queue (optional, needs Redis) ----------
+# Workers run separately: `rq worker suggest` from this directory. Jobs only
+# import suggestions.py, so workers need Redis and OpenAI but no DB.
+suggest_queue = None
+if rcache_sync:
+    try:
+        from rq import Queue
+        suggest_queue = Queue("suggest", connection=rcache_sync)
+    except Exception:
+        suggest_queue = None
+
+async def _cache_get(key: str):
+    if not rcache: return None
+    try:
+        raw = await rcache.get(key)
+        return orjson.loads(raw) if raw else None
+    except Exception:
+        logger.warning("redis get failed for %s", key, exc_info=True)
+        return None
+
+async def _cache_mget(keys: list) -> list:
+    if not rcache or not keys: return [None] * len(keys)
+    try:
+        return [orjson.loads(raw) if raw else None for raw in await rcache.mget(keys)]
     except Exception:
-        client = None
+        logger.warning("redis mget failed", exc_info=True)
+        return [None] * len(keys)
+
+async def _cache_set(key: str, value, ttl: int = SUGGEST_TTL):
+    if not rcache: return
+    try:
+        await rcache.setex(key, ttl, orjson.dumps(value))
+    except Exception:
+        logger.warning("redis set failed for %s", key, exc_info=True)
 
 # ---------- Helpers ----------
-def _ensure_device(device_id: str):
+def _device_pk(db: Session, device_id: str, create: bool = False):
+    """Map a client device_id to devices.id. Device rows never change once created,
+    so the mapping is cached in Redis (no TTL) to skip the SELECT on hot paths."""
     if not device_id: return None
-    d = g.db.query(Device).filter_by(device_id=device_id).first()
-    if not d:
+    key = f"dev:{device_id}"
+    if rcache_sync:
+        try:
+            pk = rcache_sync.get(key)
+            if pk: return int(pk)
+        except Exception:
+            logger.warning("redis get failed for %s", key, exc_info=True)
+    pk = db.execute(DEVICE_PK, {"did": device_id}).scalar_one_or_none()
+    if pk is None:
+        if not create: return None
         d = Device(device_id=device_id)
-        g.db.add(d); g.db.commit(); g.db.refresh(d)
-    return d
-
-def _signature_of(r: dict) -> str:
-    title = (r.get("title") or "").strip().lower()
-    desc  = (r.get("desc") or "").strip().lower()
-    img   = (r.get("img") or "").strip().lower()
-    return f"{title}|{desc}|{img}"[:191]
-
-def demo_recipes(ings):
-    base = ", ".join(ings[:3]) or "simple pantry items"
-    pics = [
-        "https://placehold.co/800x500?text=Recipe+Photo",
-        "https://placehold.co/800x500?text=Tasty+Dish",
-        "https://placehold.co/800x500?text=Yum",
-    ]
-    return [
-        {"title":"Quick Skillet Bowl","desc":f"One-pan weeknight bowl using {base}.",
-         "time":22,"serves":3,"level":"Easy","img":pics[0]},
-        {"title":"Creamy Pasta Toss","desc":f"Comforting pasta with {base}.",
-         "time":28,"serves":2,"level":"Easy","img":pics[1]},
-        {"title":"Veggie Stir-Fry","desc":f"Colorful stir-fry built around {base}.",
-         "time":18,"serves":2,"level":"Medium","img":pics[2]},
-    ]
+        db.add(d); db.commit()
+        pk = d.id
+    if rcache_sync:
+        try:
+            rcache_sync.set(key, pk)
+        except Exception:
+            logger.warning("redis set failed for %s", key, exc_info=True)
+    return pk
+
+SUGGEST_BULK_MAX = 20
+SUGGEST_BULK_SYSTEM = ('Cooking assistant. Input {"queries":[{id,ingredients}]}. Return JSON '
+                       '{"results":[{id,recipes:[{title,desc,time,serves,level,img}]}]}, one result per id, '
+                       f"each with exactly 3 simple, distinct recipes using as many of its ingredients as possible; {_RECIPE_SPEC}.")
+
+def _suggest_bulk_body(queries: list) -> dict:
+    """One completion for many ingredient lists; `queries` is [(id, ingredients), ...]."""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role":"system","content":SUGGEST_BULK_SYSTEM},
+            {"role":"user","content":orjson.dumps({"queries":[{"id":i,"ingredients":ings} for i, ings in queries]}).decode()},
+        ],
+        "response_format": {"type":"json_object"},
+        "max_tokens": SUGGEST_MAX_TOKENS * len(queries),
+        "temperature": SUGGEST_TEMPERATURE,
+    }
 
 # ---------- Static / Health ----------
 @app.get("/")
 def root():
-    return send_from_directory(STATIC_DIR, "index.html")
+    return FileResponse(os.path.join(STATIC_DIR, "index.html"))
 
-@app.get("/health/db")
+@app.get("/health/db", response_class=ORJSONResponse)
 def health_db():
     try:
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-        return jsonify({"ok": True})
+        return {"ok": True}
     except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+        return ORJSONResponse({"ok": False, "error": str(e)}, status_code=500)
 
-@app.get("/__routes")
+@app.get("/__routes", response_class=ORJSONResponse)
 def list_routes():
-    return {"routes": [f"{sorted(r.methods)} {r.rule}" for r in app.url_map.iter_rules()]}
+    return {"routes": [f"{sorted(r.methods)} {r.path}" for r in app.routes if getattr(r, "methods", None)]}
 
 # ---------- API: Suggest ----------
-@app.post("/api/suggest")
-def suggest():
-    data = request.get_json(silent=True) or {}
-    ingredients = [s.strip() for s in data.get("ingredients", []) if isinstance(s, str) and s.strip()]
+@app.post("/api/suggest", response_model=SuggestOut)
+async def suggest(body: SuggestIn):
+    ingredients = [s.strip() for s in body.ingredients if s.strip()]
     if not ingredients:
-        return jsonify({"error": "No ingredients provided."}), 400
+        return ORJSONResponse({"error": "No ingredients provided."}, status_code=400)
 
     if not client:
-        return jsonify({"recipes": demo_recipes(ingredients)})
-
-    prompt = (
-        "You are a cooking assistant. Suggest exactly 3 simple, distinct recipes that use as many of "
-        f"these ingredients as possible: {', '.join(ingredients)}. "
-        'Return ONLY valid JSON with shape {"recipes":[{"title":"...","desc":"...","time":25,'
-        '"serves":3,"level":"Easy","img":"https://..."}]} .'
-        "Keep titles short; times 15-40; serves 2-4; level Easy/Medium; use placeholder images if needed."
-    )
+        return {"recipes": demo_recipes(ingredients)}
+
+    key = _suggest_key(ingredients)
+    cached = await _cache_get(key)
+    if cached:
+        return cached
+
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role":"user","content":prompt}],
-            response_format={"type":"json_object"},
-            temperature=0.7,
-        )
-        content = resp.choices[0].message.content
-        payload = json.loads(content)
-        recipes = []
-        for r in (payload.get("recipes") or [])[:3]:
-            recipes.append({
-                "title": (r.get("title") or "Tasty Dish")[:200],
-                "desc": r.get("desc") or "A quick, pantry-friendly idea.",
-                "time": int(r.get("time") or 20),
-                "serves": int(r.get("serves") or 2),
-                "level": (r.get("level") or "Easy")[:16],
-                "img": r.get("img") or "https://placehold.co/800x500?text=Recipe"
-            })
-        while len(recipes) < 3:
-            recipes.append(demo_recipes(ingredients)[len(recipes)])
-        return jsonify({"recipes": recipes})
+        resp = await _complete(**_suggest_body(ingredients))
+        items = orjson.loads(resp.choices[0].message.content).get("recipes")
+        recipes = _normalize_recipes(items, ingredients)
+        if _full_set(items):
+            await _cache_set(key, {"recipes": recipes})
+        return {"recipes": recipes}
+    except pybreaker.CircuitBreakerError:
+        return {"recipes": demo_recipes(ingredients)}
     except Exception:
-        return jsonify({"recipes": demo_recipes(ingredients)})
-
-# ---------- API: Save / History / Clear ----------
-@app.post("/api/save")
-def save():
+        logger.warning("suggest failed; returning demo recipes", exc_info=True)
+        return {"recipes": demo_recipes(ingredients)}
+
+# ---------- API: Suggest (streamed) ----------
+# Same result as /api/suggest, but each recipe is pushed as a Server-Sent Event
+# as soon as its JSON object is complete in the token stream, so the first card
+# renders long before the whole completion finishes. GET so EventSource can use it.
+def _sse(data, event: str = None) -> str:
+    return (f"event: {event}\n" if event else "") + f"data: {orjson.dumps(data).decode()}\n\n"
+
+async def _stream_recipes(ingredients):
+    sent = []
+    key = _suggest_key(ingredients)
+    cached = await _cache_get(key) if client else None
+    if client and not cached:
+        try:
+            stream = await _complete(**_suggest_body(ingredients), stream=True)
+            items = ijson.sendable_list()
+            parser = ijson.items_coro(items, "recipes.item")
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta: continue
+                parser.send(delta.encode())
+                for r in items:
+                    if len(sent) < 3 and isinstance(r, dict):
+                        sent.append(_normalize_recipe(r))
+                        yield _sse(sent[-1])
+                del items[:]
+            parser.close()
+        except pybreaker.CircuitBreakerError:
+            pass   # breaker open: straight to the cached/demo fill below
+        except Exception:
+            logger.warning("suggest stream failed after %d recipes", len(sent), exc_info=True)
+        else:
+            if _full_set(sent):
+                await _cache_set(key, {"recipes": sent})
+    fill = (cached or {}).get("recipes") or demo_recipes(ingredients)
+    for r in fill[len(sent):3]:
+        sent.append(r)
+        yield _sse(r)
+    yield _sse({"count": len(sent)}, event="done")
+
+@app.get("/api/suggest/stream")
+async def suggest_stream(ingredients: list[str] = Query([])):
+    ingredients = [s.strip() for s in ingredients if s.strip()]
+    if not ingredients:
+        return ORJSONResponse({"error": "No ingredients provided."}, status_code=400)
+    return StreamingResponse(_stream_recipes(ingredients), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---------- API: Suggest (bulk, single completion) ----------
+# Many ingredient lists answered by one chat completion: one round-trip and one
+# copy of the instructions instead of N. Lists already in the suggest cache are
+# served from it and only the misses are sent.
+def _bulk_by_id(payload, n: int) -> dict:
+    """Map query id -> recipes. The model sometimes echoes ids as strings or
+    drops them; when it returned exactly one result per query, fall back to order."""
+    items = [r for r in (payload.get("results") or []) if isinstance(r, dict)]
+    by_id = {}
+    for r in items:
+        try:
+            by_id[int(r.get("id"))] = r.get("recipes")
+        except (TypeError, ValueError):
+            pass
+    if len(by_id) < n and len(items) == n:
+        return {i: r.get("recipes") for i, r in enumerate(items)}
+    return by_id
+
+@app.post("/api/suggest_bulk", response_class=ORJSONResponse)
+async def suggest_bulk(body: IngredientListsIn):
+    lists = [[s.strip() for s in ings if s.strip()] for ings in body.ingredient_lists]
+    if not any(lists):
+        return ORJSONResponse({"error": "No ingredients provided."}, status_code=400)
+    if len(lists) > SUGGEST_BULK_MAX:
+        return ORJSONResponse({"error": f"At most {SUGGEST_BULK_MAX} ingredient lists."}, status_code=400)
+    if not client:
+        return {"results": [demo_recipes(ings) if ings else [] for ings in lists]}
+
+    keys = [_suggest_key(ings) if ings else None for ings in lists]
+    results = [[] for _ in lists]
+    misses = {}   # cache key -> indexes of lists waiting on it
+    hits = iter(await _cache_mget([k for k in keys if k]))
+    for i, key in enumerate(keys):
+        if not key: continue
+        hit = next(hits)
+        if hit: results[i] = hit["recipes"]
+        else: misses.setdefault(key, []).append(i)
+    if not misses:
+        return {"results": results}
+
+    queries = [(qid, lists[idxs[0]]) for qid, idxs in enumerate(misses.values())]
     try:
-        payload = request.get_json(force=True)
+        resp = await _complete(**_suggest_bulk_body(queries))
+        payload = orjson.loads(resp.choices[0].message.content)
+        by_id = _bulk_by_id(payload, len(queries))
+    except pybreaker.CircuitBreakerError:
+        by_id = {}
     except Exception:
-        return jsonify({"error": "invalid_json"}), 400
+        logger.warning("bulk suggest failed; returning demo recipes", exc_info=True)
+        by_id = {}
+    for (qid, ings), (key, idxs) in zip(queries, misses.items()):
+        items = by_id.get(qid)
+        try:
+            recipes = _normalize_recipes(items, ings)
+        except Exception:   # e.g. "time": "about 20 min", or recipes that aren't objects
+            logger.warning("bulk suggest returned bad recipes for query %s", qid, exc_info=True)
+            recipes = demo_recipes(ings)
+        else:
+            if _full_set(items):
+                await _cache_set(key, {"recipes": recipes})
+        for i in idxs:
+            results[i] = recipes
+    return {"results": results}
+
+# ---------- API: Suggest (Batch API) ----------
+# Non-urgent bulk work (e.g. precomputing popular ingredient combos) goes through
+# OpenAI's Batch API: half price, no RPM/TPM pressure, results within 24h.
+# Each line's custom_id is the suggest cache key, so finished batches warm the
+# same cache /api/suggest reads from. Submitted batches are recorded in Redis
+# (batch:<id> -> {key: ingredients}) so only our own batches can be collected.
+SUGGEST_BATCH_MAX = 500
+BATCH_TTL = 3 * 24 * 3600   # 24h completion window plus time to collect
+
+def _openai_error(e):
+    status = 503 if isinstance(e, _TRANSIENT) else 502
+    logger.warning("OpenAI batch call failed: %s", e)
+    return ORJSONResponse({"error": "openai_error"}, status_code=status)
+
+@app.post("/api/suggest/batch", response_class=ORJSONResponse)
+async def suggest_batch(body: IngredientListsIn):
+    if not client:
+        return ORJSONResponse({"error": "openai_unavailable"}, status_code=503)
+    if not rcache:
+        return ORJSONResponse({"error": "redis_unavailable"}, status_code=503)
+    if len(body.ingredient_lists) > SUGGEST_BATCH_MAX:
+        return ORJSONResponse({"error": f"At most {SUGGEST_BATCH_MAX} ingredient lists per batch."}, status_code=400)
+    lists = [[s.strip() for s in ings if s.strip()] for ings in body.ingredient_lists]
+    keys, wanted, lines = [], {}, {}
+    for ings in lists:
+        if not ings:
+            keys.append(None); continue
+        key = _suggest_key(ings)
+        keys.append(key)
+        if key in lines: continue
+        wanted[key] = ings
+        lines[key] = orjson.dumps({
+            "custom_id": key, "method": "POST", "url": "/v1/chat/completions",
+            "body": _suggest_body(ings),
+        })
+    if not lines:
+        return ORJSONResponse({"error": "No ingredients provided."}, status_code=400)
+
+    try:
+        f = await client.files.create(file=("suggest.jsonl", b"\n".join(lines.values())), purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=f.id, endpoint="/v1/chat/completions", completion_window="24h",
+        )
+    except _API_ERROR as e:
+        return _openai_error(e)
+    await rcache.set(f"batch:{batch.id}", orjson.dumps(wanted), ex=BATCH_TTL)
+    return {"batch_id": batch.id, "status": batch.status, "keys": keys}
+
+@app.get("/api/suggest/batch/{batch_id}", response_class=ORJSONResponse)
+async def suggest_batch_status(batch_id: str):
+    if not client:
+        return ORJSONResponse({"error": "openai_unavailable"}, status_code=503)
+    if not rcache:
+        return ORJSONResponse({"error": "redis_unavailable"}, status_code=503)
+    raw = await rcache.get(f"batch:{batch_id}")
+    if not raw:
+        return ORJSONResponse({"error": "not_found"}, status_code=404)
+    wanted = orjson.loads(raw)
+    try:
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status != "completed" or not batch.output_file_id:
+            return {"batch_id": batch.id, "status": batch.status}
+        out = await client.files.content(batch.output_file_id)
+    except _API_ERROR as e:
+        return _openai_error(e)
+
+    results = {}
+    for line in out.text.splitlines():
+        if not line.strip(): continue
+        item = orjson.loads(line)
+        key = item.get("custom_id")
+        if key not in wanted: continue   # only keys we submitted, so only sugg: entries
+        resp = item.get("response") or {}
+        if resp.get("status_code") != 200: continue
+        try:
+            items = orjson.loads(resp["body"]["choices"][0]["message"]["content"]).get("recipes")
+            recipes = _normalize_recipes(items, wanted[key])
+        except Exception:
+            continue
+        results[key] = recipes
+        if _full_set(items):
+            await _cache_set(key, {"recipes": recipes})
+    return {"batch_id": batch.id, "status": batch.status, "results": results}
+
+# ---------- API: Suggest (background job) ----------
+# Enqueue and return a task id right away; the client polls the status route.
+# The OpenAI call happens in an RQ worker process, not in the web worker; the job
+# body lives in suggestions.py so workers never import this module.
+@app.post("/api/suggest/jobs", response_class=ORJSONResponse)
+def suggest_enqueue(body: SuggestIn):
+    ingredients = [s.strip() for s in body.ingredients if s.strip()]
+    if not ingredients:
+        return ORJSONResponse({"error": "No ingredients provided."}, status_code=400)
+    if not suggest_queue:
+        return ORJSONResponse({"error": "queue_unavailable"}, status_code=503)
+    job = suggest_queue.enqueue(run_openai_suggest, ingredients, job_timeout=60, result_ttl=3600)
+    return {"task": job.id}
+
+@app.get("/api/suggest/status/{task_id}", response_class=ORJSONResponse)
+def suggest_status(task_id: str):
+    if not suggest_queue:
+        return ORJSONResponse({"error": "queue_unavailable"}, status_code=503)
+    job = suggest_queue.fetch_job(task_id)
+    if not job:
+        return ORJSONResponse({"error": "unknown_task"}, status_code=404)
+    state = job.get_status()
+    result = job.return_value() if state == "finished" else None
+    return {"state": state, "recipes": (result or {}).get("recipes")}
 
-    device_id = (payload or {}).get("device_id")
-    recipe_in = (payload or {}).get("recipe") or {}
-    d = _ensure_device(device_id)
-    if not d:
-        return jsonify({"error": "missing device_id"}), 400
+# ---------- API: Save / History / Clear ----------
+@app.post("/api/save", response_class=ORJSONResponse)
+@_retry_stale
+def save(body: SaveIn, db: Session = Depends(get_db)):
+    recipe_in = body.recipe or RecipeIn()
+    dev = _device_pk(db, body.device_id, create=True)
+    if not dev:
+        return ORJSONResponse({"error": "missing device_id"}, status_code=400)
 
     r = {
-        "title": (recipe_in.get("title") or "Recipe")[:200],
-        "desc": recipe_in.get("desc") or "",
-        "time": int(recipe_in.get("time") or 20),
-        "serves": int(recipe_in.get("serves") or 2),
-        "level": (recipe_in.get("level") or "Easy")[:16],
-        "img": recipe_in.get("img") or "",
+        "title": (recipe_in.title or "Recipe")[:200],
+        "desc": recipe_in.desc or "",
+        "time": int(recipe_in.time or 20),
+        "serves": int(recipe_in.serves or 2),
+        "level": (recipe_in.level or "Easy")[:16],
+        "img": recipe_in.img or "",
     }
     sig = _signature_of(r)
-    db = g.db
     try:
-        rec = db.query(Recipe).filter_by(signature=sig).first()
-        if not rec:
-            rec = Recipe(**r, signature=sig)
-            db.add(rec); db.commit(); db.refresh(rec)
-
-        link = db.query(SavedRecipe).filter_by(device_id_fk=d.id, recipe_id_fk=rec.id).first()
-        if link:
-            return jsonify({"saved": False, "message": "Already saved", "recipe_id": rec.id}), 200
-
-        link = SavedRecipe(device_id_fk=d.id, recipe_id_fk=rec.id)
-        db.add(link); db.commit()
-        return jsonify({"saved": True, "recipe_id": rec.id}), 200
+        rec_id = _upsert_recipe(db, r, sig)
+        saved = _link_saved(db, dev, rec_id)
+        db.commit()
+        if not saved:
+            return {"saved": False, "message": "Already saved", "recipe_id": rec_id}
+        return {"saved": True, "recipe_id": rec_id}
 
     except IntegrityError:
         db.rollback()
-        return jsonify({"saved": False, "message": "Already saved"}), 200
+        return {"saved": False, "message": "Already saved"}
+    except OperationalError as e:
+        if e.connection_invalidated: raise   # let _retry_stale take it
+        db.rollback()
+        logger.exception("save_failed")
+        return ORJSONResponse({"error": "save_failed", "detail": str(e)}, status_code=500)
     except Exception as e:
         db.rollback()
-        app.logger.exception("save_failed")
-        return jsonify({"error": "save_failed", "detail": str(e)}), 500
-
-@app.get("/api/history")
-def history():
-    device_id = request.args.get("device_id")
-    db = g.db
-    d = db.query(Device).filter_by(device_id=device_id).first()
-    if not d:
-        return jsonify({"recipes": []})
-    rows = (
-        db.query(SavedRecipe)
-          .filter(SavedRecipe.device_id_fk == d.id)
-          .order_by(SavedRecipe.created_at.desc())
-          .limit(50).all()
-    )
-    out = [{
-        "id": r.recipe.id, "title": r.recipe.title, "desc": r.recipe.desc,
-        "time": r.recipe.time, "serves": r.recipe.serves,
-        "level": r.recipe.level, "img": r.recipe.img
-    } for r in rows]
-    return jsonify({"recipes": out})
-
-@app.post("/api/clear")
-def clear_saved():
-    payload = request.get_json(silent=True) or {}
-    device_id = payload.get("device_id")
-    if not device_id: return jsonify({"deleted": 0})
-    db = g.db
-    d = db.query(Device).filter_by(device_id=device_id).first()
-    if not d: return jsonify({"deleted": 0})
-    deleted = db.query(SavedRecipe).filter_by(device_id_fk=d.id).delete()
+        logger.exception("save_failed")
+        return ORJSONResponse({"error": "save_failed", "detail": str(e)}, status_code=500)
+
+@app.get("/api/history", response_model=HistoryOut)
+@_retry_stale
+def history(device_id: Optional[str] = None, db: Session = Depends(get_db)):
+    dev = _device_pk(db, device_id)
+    if not dev:
+        return {"recipes": []}
+    # plain column rows: no ORM instances or identity-map bookkeeping to build and throw away.
+    # Returned as a ready Response so FastAPI doesn't re-validate and re-encode the rows
+    # against HistoryOut (which stays for the OpenAPI schema).
+    rows = db.execute(HISTORY, {"dev": dev}).all()
+    return Response(orjson.dumps({"recipes": [dict(r._mapping) for r in rows]}), media_type="application/json")
+
+@app.post("/api/clear", response_class=ORJSONResponse)
+@_retry_stale
+def clear_saved(body: ClearIn, db: Session = Depends(get_db)):
+    device_id = body.device_id
+    if not device_id: return {"deleted": 0}
+    dev = _device_pk(db, device_id)
+    if not dev: return {"deleted": 0}
+    deleted = db.execute(CLEAR_SAVED, {"dev": dev}).rowcount
     db.commit()
-    return jsonify({"deleted": deleted})
+    return {"deleted": deleted}
 
 # ---------- Auth ----------
-from werkzeug.security import generate_password_hash, check_password_hash
-
-def current_user():
-    uid = session.get("uid")
-    return g.db.query(User).get(uid) if uid else None
-
-@app.post("/auth/signup")
-def auth_signup():
-    try:
-        data = request.get_json(force=True)
-    except Exception:
-        return jsonify({"ok": False, "error": "invalid_json"}), 400
-    name = (data.get("name") or "").strip()
-    email = (data.get("email") or "").strip().lower()
-    password = data.get("password") or ""
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from werkzeug.security import check_password_hash   # legacy pbkdf2 hashes only
+
+# argon2id at OWASP's minimum profile: far cheaper per login than Werkzeug's
+# 600k-iteration pbkdf2 default at comparable strength.
+ph = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+def _verify_password(db: Session, user: User, password: str) -> bool:
+    h = user.password_hash
+    if h.startswith("$argon2"):
+        try:
+            ph.verify(h, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        if not ph.check_needs_rehash(h):
+            return True
+    elif not check_password_hash(h, password):
+        return False
+    # legacy pbkdf2 or outdated argon2 params: upgrade in place now that we have the password
+    user.password_hash = ph.hash(password)
+    db.commit()
+    return True
+
+# With Redis configured the cookie only carries an opaque session id and the uid
+# lives server-side (sess:<sid>); otherwise we fall back to the signed cookie
+# from SessionMiddleware. SessionMiddleware only re-signs when the session is
+# non-empty, so the Redis path skips that work entirely.
+SESSION_COOKIE = "rm_sid"
+SESSION_TTL    = 14 * 24 * 3600
+USER_TTL       = 300
+
+def _user_out(u) -> dict:
+    return {"id": u.id, "name": u.name, "email": u.email}
+
+def _session_uid(request: Request):
+    sid = request.cookies.get(SESSION_COOKIE)
+    if rcache_sync and sid:
+        try:
+            uid = rcache_sync.get(f"sess:{sid}")
+            if uid: return int(uid)
+        except Exception:
+            logger.warning("redis session lookup failed", exc_info=True)
+    return request.session.get("uid")
+
+def _login(request: Request, response: Response, uid: int):
+    if rcache_sync:
+        try:
+            sid = secrets.token_urlsafe(32)
+            rcache_sync.setex(f"sess:{sid}", SESSION_TTL, uid)
+            response.set_cookie(SESSION_COOKIE, sid, max_age=SESSION_TTL, httponly=True, samesite="lax")
+            return
+        except Exception:
+            logger.warning("redis session write failed; using signed cookie", exc_info=True)
+    request.session["uid"] = uid
+
+def _logout(request: Request, response: Response):
+    sid = request.cookies.get(SESSION_COOKIE)
+    if rcache_sync and sid:
+        try:
+            rcache_sync.delete(f"sess:{sid}")
+        except Exception:
+            logger.warning("redis session delete failed", exc_info=True)
+    response.delete_cookie(SESSION_COOKIE)
+    request.session.pop("uid", None)
+
+def current_user(request: Request, db: Session):
+    """Public fields of the logged-in user, cached in Redis for USER_TTL seconds."""
+    uid = _session_uid(request)
+    if not uid: return None
+    key = f"user:{uid}"
+    if rcache_sync:
+        try:
+            raw = rcache_sync.get(key)
+            if raw: return orjson.loads(raw)
+        except Exception:
+            logger.warning("redis get failed for %s", key, exc_info=True)
+    u = db.get(User, uid)
+    if not u: return None
+    out = _user_out(u)
+    if rcache_sync:
+        try:
+            rcache_sync.setex(key, USER_TTL, orjson.dumps(out))
+        except Exception:
+            logger.warning("redis set failed for %s", key, exc_info=True)
+    return out
+
+@app.post("/auth/signup", response_class=ORJSONResponse)
+@_retry_stale
+def auth_signup(body: SignupIn, request: Request, response: Response, db: Session = Depends(get_db)):
+    name = (body.name or "").strip()
+    email = (body.email or "").strip().lower()
+    password = body.password or ""
     if not email or not password:
-        return jsonify({"ok": False, "error": "missing_fields"}), 400
-    db = g.db
-    if db.query(User).filter_by(email=email).first():
-        return jsonify({"ok": False, "error": "email_exists"}), 409
-    user = User(name=name[:120], email=email, password_hash=generate_password_hash(password))
+        return ORJSONResponse({"ok": False, "error": "missing_fields"}, status_code=400)
+    if db.execute(USER_BY_EMAIL, {"email": email}).scalar_one_or_none():
+        return ORJSONResponse({"ok": False, "error": "email_exists"}, status_code=409)
+    user = User(name=name[:120], email=email, password_hash=ph.hash(password))
     db.add(user); db.commit(); db.refresh(user)
-    session["uid"] = user.id
-    return jsonify({"ok": True, "user": {"id": user.id, "name": user.name, "email": user.email}})
-
-@app.post("/auth/login")
-def auth_login():
-    data = request.get_json(force=True)
-    email = (data.get("email") or "").strip().lower()
-    password = data.get("password") or ""
-    user = g.db.query(User).filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
-        return jsonify({"ok": False, "error": "invalid_credentials"}), 401
-    session["uid"] = user.id
-    return jsonify({"ok": True, "user": {"id": user.id, "name": user.name, "email": user.email}})
-
-@app.post("/auth/logout")
-def auth_logout():
-    session.pop("uid", None)
-    return jsonify({"ok": True})
-
-@app.get("/auth/me")
-def auth_me():
-    u = current_user()
-    return (jsonify({"ok": True, "user": {"id": u.id, "name": u.name, "email": u.email}}) 
-            if u else jsonify({"ok": False}))
+    _login(request, response, user.id)
+    return {"ok": True, "user": _user_out(user)}
+
+@app.post("/auth/login", response_class=ORJSONResponse)
+@_retry_stale
+def auth_login(body: LoginIn, request: Request, response: Response, db: Session = Depends(get_db)):
+    email = (body.email or "").strip().lower()
+    password = body.password or ""
+    user = db.execute(USER_BY_EMAIL, {"email": email}).scalar_one_or_none()
+    if not user or not _verify_password(db, user, password):
+        return ORJSONResponse({"ok": False, "error": "invalid_credentials"}, status_code=401)
+    _login(request, response, user.id)
+    return {"ok": True, "user": _user_out(user)}
+
+@app.post("/auth/logout", response_class=ORJSONResponse)
+def auth_logout(request: Request, response: Response):
+    _logout(request, response)
+    return {"ok": True}
+
+@app.get("/auth/me", response_class=ORJSONResponse)
+@_retry_stale
+def auth_me(request: Request, db: Session = Depends(get_db)):
+    u = current_user(request, db)
+    return {"ok": True, "user": u} if u else {"ok": False}
+
+# ---------- Static files (mounted last so API routes win) ----------
+app.mount("/", StaticFiles(directory=STATIC_DIR), name="static")
 
 # ---------- Run ----------
 if __name__ == "__main__":
+    import uvicorn
     print(">>> BASE_DIR:", BASE_DIR)
     print(">>> STATIC_DIR exists:", os.path.exists(STATIC_DIR))
     print(">>> index.html present:", os.path.exists(os.path.join(STATIC_DIR, "index.html")))
     print(">>> DATABASE_URL:", DATABASE_URL)
     port = int(os.getenv("PORT", "5000"))
-    app.run(debug=False, host="0.0.0.0", port=port)
+    # production: gunicorn -c gunicorn.conf.py app:app  (or uvicorn app:app --workers 4 --loop uvloop)
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,18 @@
+# gunicorn -c server/gunicorn.conf.py app:app
+#
+# The app is ASGI (FastAPI), so gevent monkey-patching does not apply: each
+# worker runs a uvicorn event loop (uvloop when installed) and awaits OpenAI
+# calls cooperatively. Sync DB routes run in the per-process threadpool sized
+# by THREADPOOL_SIZE (see app.py). Each worker's DB pool is its share of
+# DB_MAX_CONNECTIONS, so raising WEB_CONCURRENCY shrinks the per-worker pool
+# instead of pushing the database past max_connections.
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn_worker.UvicornWorker"
+keepalive = 5
+timeout = 60            # OpenAI round-trips can take several seconds
+graceful_timeout = 30
+accesslog = "-"
@@ -1,4 +1,4 @@
-// If you run Flask on a different port, change this:
+// If you run the API on a different port, change this:
 const API_BASE = ""; // "" -> same origin (http://127.0.0.1:5000). Example: "http://127.0.0.1:5050"
 
 const DEFAULT_IMAGES = ["img/recipe1.jpg", "img/recipe2.jpg", "img/recipe3.jpg"];
@@ -115,6 +115,12 @@ btn.addEventListener("click", async () => {
   showSkeletons();
 
   try {
+    // Stream recipes in as they are generated; plain POST for old browsers
+    if (window.EventSource) {
+      await streamRecipes(ingredients);
+      return;
+    }
+
     // 10s timeout so it never hangs
     const ctrl = new AbortController();
     const t = setTimeout(() => ctrl.abort(), 10000);
@@ -145,9 +151,36 @@ btn.addEventListener("click", async () => {
   }
 });
 
-function showSkeletons(){
-  grid.innerHTML = "";
-  for (let i=0;i<3;i++){
+// Server-Sent Events: one `message` per recipe, then a `done` event.
+// Resolves with whatever arrived; rejects only if nothing did.
+function streamRecipes(ingredients){
+  return new Promise((resolve, reject) => {
+    const qs = ingredients.map(i => `ingredients=${encodeURIComponent(i)}`).join("&");
+    const es = new EventSource(`${API_BASE}/api/suggest/stream?${qs}`);
+    const got = [];
+    const finish = (err) => {
+      clearTimeout(t);
+      es.close(); // otherwise EventSource reconnects
+      if (!got.length) return reject(err);
+      renderRecipes(got); // drop skeletons left over from a cut-short stream
+      resolve(got);
+    };
+    // 10s timeout so it never hangs
+    const t = setTimeout(() => finish(new Error("stream timeout")), 10000);
+
+    es.onmessage = (e) => {
+      got.push(JSON.parse(e.data));
+      renderRecipes(got);
+      showSkeletons(3 - got.length, false);
+    };
+    es.addEventListener("done", () => finish());
+    es.onerror = () => finish(new Error("stream error"));
+  });
+}
+
+function showSkeletons(n = 3, clear = true){
+  if (clear) grid.innerHTML = "";
+  for (let i=0;i<n;i++){
     const card = document.createElement("div");
     card.className = "card-recipe skel";
     card.innerHTML = `
@@ -0,0 +1,116 @@
+"""Recipe suggestion core shared by the web app and the RQ worker.
+
+Kept free of import-time side effects (no DB, no FastAPI app, no clients) so
+`rq worker suggest` can import run_openai_suggest cheaply for every job.
+"""
+import os, hashlib, logging
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.abspath(os.path.dirname(__file__)), ".env"))
+logger = logging.getLogger("recipe-matcher")
+
+SUGGEST_TTL = 24 * 3600
+
+def _suggest_key(ingredients) -> str:
+    norm = sorted({s.lower() for s in ingredients})
+    return "sugg:" + hashlib.sha1(",".join(norm).encode()).hexdigest()
+
+# (title, desc template, time, serves, level, img) -- only the ingredient text varies per call
+_DEMO = (
+    ("Quick Skillet Bowl", "One-pan weeknight bowl using %s.", 22, 3, "Easy",
+     "https://placehold.co/800x500?text=Recipe+Photo"),
+    ("Creamy Pasta Toss", "Comforting pasta with %s.", 28, 2, "Easy",
+     "https://placehold.co/800x500?text=Tasty+Dish"),
+    ("Veggie Stir-Fry", "Colorful stir-fry built around %s.", 18, 2, "Medium",
+     "https://placehold.co/800x500?text=Yum"),
+)
+
+def demo_recipes(ings):
+    base = ", ".join(ings[:3]) or "simple pantry items"
+    return [{"title":t,"desc":d % base,"time":tm,"serves":sv,"level":lv,"img":img}
+            for t, d, tm, sv, lv, img in _DEMO]
+
+# Terse instructions sent as the system message; the user message is just the
+# ingredient list. Fewer prompt tokens, and max_tokens bounds the JSON we pay for.
+_RECIPE_SPEC = ("title<=40ch, desc<=120ch, time 15-40, serves 2-4, level Easy|Medium, "
+                "img https URL (placeholder ok)")
+SUGGEST_SYSTEM = ('Cooking assistant. Return JSON {"recipes":[{title,desc,time,serves,level,img}]} with '
+                  f"exactly 3 simple, distinct recipes using as many given ingredients as possible; {_RECIPE_SPEC}.")
+SUGGEST_MAX_TOKENS = 450
+SUGGEST_TEMPERATURE = 0.5
+
+def _suggest_body(ingredients) -> dict:
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role":"system","content":SUGGEST_SYSTEM},
+            {"role":"user","content":", ".join(ingredients)},
+        ],
+        "response_format": {"type":"json_object"},
+        "max_tokens": SUGGEST_MAX_TOKENS,
+        "temperature": SUGGEST_TEMPERATURE,
+    }
+
+def _normalize_recipe(r: dict) -> dict:
+    return {
+        "title": (r.get("title") or "Tasty Dish")[:200],
+        "desc": r.get("desc") or "A quick, pantry-friendly idea.",
+        "time": int(r.get("time") or 20),
+        "serves": int(r.get("serves") or 2),
+        "level": (r.get("level") or "Easy")[:16],
+        "img": r.get("img") or "https://placehold.co/800x500?text=Recipe"
+    }
+
+def _full_set(items) -> bool:
+    """True when the model returned all 3 recipes itself. Only those get cached,
+    otherwise demo padding would be served to everyone for SUGGEST_TTL."""
+    return isinstance(items, list) and sum(isinstance(r, dict) for r in items[:3]) == 3
+
+def _normalize_recipes(items, ingredients) -> list:
+    recipes = [_normalize_recipe(r) for r in (items or [])[:3]]
+    if len(recipes) < 3:
+        recipes += demo_recipes(ingredients)[len(recipes):]
+    return recipes
+
+# ---------- RQ job ----------
+# Clients are created on first use so importing this module stays free.
+_sync_client = _redis = None
+
+def _job_redis():
+    global _redis
+    if _redis is None and os.getenv("REDIS_URL"):
+        import redis
+        _redis = redis.Redis.from_url(os.getenv("REDIS_URL"))
+    return _redis
+
+def run_openai_suggest(ingredients: list) -> dict:
+    """RQ job body. Sync on purpose: RQ workers run plain functions."""
+    global _sync_client
+    key = _suggest_key(ingredients)
+    r = _job_redis()
+    if r:
+        try:
+            raw = r.get(key)
+            if raw: return orjson.loads(raw)
+        except Exception:
+            logger.warning("redis get failed for %s", key, exc_info=True)
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return {"recipes": demo_recipes(ingredients)}
+    try:
+        if _sync_client is None:
+            from openai import OpenAI
+            _sync_client = OpenAI(api_key=api_key)
+        resp = _sync_client.chat.completions.create(**_suggest_body(ingredients))
+        items = orjson.loads(resp.choices[0].message.content).get("recipes")
+        out = {"recipes": _normalize_recipes(items, ingredients)}
+    except Exception:
+        logger.warning("suggest job failed; returning demo recipes", exc_info=True)
+        return {"recipes": demo_recipes(ingredients)}
+    if r and _full_set(items):
+        try:
+            r.setex(key, SUGGEST_TTL, orjson.dumps(out))
+        except Exception:
+            logger.warning("redis set failed for %s", key, exc_info=True)
+    return out